@@ -1,13 +1,15 @@
 import argparse
-import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
+import orjson
 import yaml
 from tqdm import tqdm
 
-from src.core.graph_builder import TranslationPipeline
+from src.core.graph_builder import get_pipeline
 
 # Setup logging
 format = "%(asctime)s - %(levelname)s: %(message)s"
@@ -15,6 +17,26 @@ logging.basicConfig(level=logging.INFO, format=format)
 logger = logging.getLogger(__name__)
 
 
+def process_one(doc_path: Path, backtrans_dir: Path, config: dict):
+    # Flip source/target because backtranslation
+    translator = get_pipeline(
+        source_lang=config["language"]["target"],
+        target_lang=config["language"]["source"],
+        config=config,
+    )
+
+    with open(doc_path, "rb") as f:
+        sentences = [orjson.loads(line)["text"] for line in f]
+
+    graph_save_dir = backtrans_dir / f"{doc_path.stem}.json"
+
+    translator.run(
+        source_sentences=sentences,
+        graph_save_dir=graph_save_dir,
+        preloaded_state=None,
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(description="Backtranslate fetched docs -> source")
     parser.add_argument("--config", type=str, default="config/config.yaml")
@@ -38,25 +60,16 @@ def main():
     if not proc_dir.exists():
         raise ValueError("Use run_ingestion to collect documents first")
 
-    # Flip source/target because backtranslation
-    translator = TranslationPipeline(
-        source_lang=config["language"]["target"],
-        target_lang=config["language"]["source"],
-        config=config,
-    )
-
-    for doc_path in tqdm(proc_dir.glob("*.jsonl"), desc="Backtranslating documents..."):
-        with open(doc_path, "r", encoding="utf-8") as f:
-            document = [json.loads(json_str) for json_str in f.readlines()]
-        sentences = [line["text"] for line in document]
-
-        graph_save_dir = backtrans_dir / f"{doc_path.stem}.json"
-
-        translator.run(
-            source_sentences=sentences,
-            graph_save_dir=graph_save_dir,
-            preloaded_state=None,
+    doc_paths = list(proc_dir.glob("*.jsonl"))
+    with ThreadPoolExecutor(max_workers=config["concurrency"]["docs"]) as executor:
+        results = executor.map(
+            partial(process_one, backtrans_dir=backtrans_dir, config=config),
+            doc_paths,
         )
+        for _ in tqdm(
+            results, total=len(doc_paths), desc="Backtranslating documents..."
+        ):
+            pass
 
 
 if __name__ == "__main__":
@@ -1,15 +1,21 @@
 import argparse
-import hashlib
-import json
+import asyncio
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
 from pathlib import Path
+from typing import Dict, List, Tuple
 
+import aiohttp
+import blake3
+import orjson
+import uvloop
 import yaml
 from tqdm import tqdm
 
-from src.ingestion.downloader import download_pdf, setup_pdf_driver
-from src.ingestion.metadata import fetch_openalex_metadata
-from src.ingestion.parser import clean_text, extract_text
+from src.ingestion.downloader import download_pdf, download_pdfs_browser, pdf_filename
+from src.ingestion.metadata import fetch_openalex_metadata_async
+from src.ingestion.parser import clean_text, extract_text, parse_many
 
 # Setup logging
 format = "%(asctime)s - %(levelname)s: %(message)s"
@@ -17,6 +23,67 @@ logging.basicConfig(level=logging.INFO, format=format)
 logger = logging.getLogger(__name__)
 
 
+async def fetch_and_extract(
+    target_code: str, limit: int, raw_dir: Path, pool: ProcessPoolExecutor
+) -> Tuple[Dict[Path, str], List[str]]:
+    """Overlap metadata fetching, PDF downloads and text extraction."""
+    queue = asyncio.Queue(maxsize=64)
+    doc_texts = {}
+    failed_urls = []
+    loop = asyncio.get_running_loop()
+
+    connector = aiohttp.TCPConnector(limit=128, ttl_dns_cache=300, use_dns_cache=True)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        with tqdm(desc="Downloading documents") as pbar:
+
+            async def consume():
+                while (doc := await queue.get()) is not None:
+                    pdf_url = doc["pdf_url"]
+                    dest = raw_dir / pdf_filename(pdf_url)
+                    try:
+                        downloaded = await download_pdf(pdf_url, session, dest)
+                    except Exception as e:
+                        logger.error(f"Failed to download PDF: {e}")
+                        dest.unlink(missing_ok=True)
+                        downloaded = False
+
+                    if not downloaded:
+                        failed_urls.append(pdf_url)
+                    else:
+                        try:
+                            doc_texts[dest] = await loop.run_in_executor(
+                                pool, extract_text, dest
+                            )
+                        except Exception as e:
+                            # e.g. a worker crashed inside MuPDF; the file
+                            # stays on disk for the parse pass after this
+                            logger.error(f"Failed to extract text from PDF: {e}")
+                    pbar.update(1)
+
+            consumers = [asyncio.create_task(consume()) for _ in range(16)]
+            producer = asyncio.create_task(
+                fetch_openalex_metadata_async(target_code, limit, queue)
+            )
+
+            # Consumers only return after a sentinel, so one finishing first
+            # has crashed; stop the producer rather than let it block forever
+            # on a full queue
+            done, _ = await asyncio.wait(
+                [producer, *consumers], return_when=asyncio.FIRST_COMPLETED
+            )
+            if producer not in done:
+                for task in [producer, *consumers]:
+                    task.cancel()
+                await asyncio.gather(producer, *consumers, return_exceptions=True)
+                done.pop().result()
+
+            for _ in consumers:
+                await queue.put(None)
+            await asyncio.gather(producer, *consumers)
+
+    return doc_texts, failed_urls
+
+
 def main():
     parser = argparse.ArgumentParser(description="Fetch papers from OpenAlex")
     parser.add_argument("--num_docs", type=int, required=True, help="# documents")
@@ -40,29 +107,52 @@ def main():
     proc_dir.mkdir(parents=True, exist_ok=True)
 
     logger.info(f"Fetching {args.num_docs} documents for {target_code} from OpenAlex")
-    documents = fetch_openalex_metadata(target_code, args.limit)
-
-    # Download PDFs
-    driver = setup_pdf_driver(raw_dir)
-    for doc in tqdm(documents, desc="Downloading documents"):
-        download_pdf(doc["pdf_url"], driver)
+    with ProcessPoolExecutor(max_workers=config["concurrency"]["parse"]) as pool:
+        doc_texts, failed_urls = uvloop.run(
+            fetch_and_extract(target_code, args.limit, raw_dir, pool)
+        )
+
+    # Fall back to a browser for URLs that don't serve the file itself
+    # (landing pages, JS redirects)
+    if failed_urls:
+        download_pdfs_browser(
+            failed_urls, raw_dir, num_drivers=config["concurrency"]["browsers"]
+        )
 
     # Process PDFs and convert to sentences
     kept_count = 0
-    for pdf_path in tqdm(raw_dir.glob("*.pdf"), desc="Parsing documents..."):
-        doc_text = extract_text(pdf_path)
-        sentences = clean_text(doc_text, target_code, source_code)
-
-        if len(sentences) < 10:
+    # Snapshot before the loop renames files inside raw_dir
+    pdf_paths = sorted(p for p in raw_dir.iterdir() if p.suffix == ".pdf")
+
+    # PDFs the pipeline didn't extract (browser downloads, earlier runs) are
+    # parsed in worker processes; language detection already spreads over
+    # lingua's own threads, so cleaning stays in this process
+    remaining = parse_many(
+        [p for p in pdf_paths if p not in doc_texts],
+        max_workers=config["concurrency"]["parse"],
+    )
+    for pdf_path in tqdm(pdf_paths, desc="Parsing documents..."):
+        # Only this run's direct OpenAlex downloads are known to match
+        # language:{target_code}; browser downloads and files left by earlier
+        # runs still get the document-level check
+        from_openalex = pdf_path in doc_texts
+        doc_text = doc_texts.pop(pdf_path) if from_openalex else next(remaining)
+        sentences = clean_text(
+            doc_text, target_code, source_code, assume_target=from_openalex
+        )
+        head = list(islice(sentences, 10))
+        if len(head) < 10:
             pdf_path.unlink()
             continue
 
-        id = hashlib.md5(pdf_path.stem.encode("utf-8")).hexdigest()[:8]
+        id = blake3.blake3(pdf_path.stem.encode("utf-8")).hexdigest(length=4)
         doc_path = proc_dir / f"{kept_count:04d}_{id}.jsonl"
 
-        with open(doc_path, "w", encoding="utf-8") as f:
-            for sent in sentences:
-                f.write(json.dumps({"text": sent}, ensure_ascii=False) + "\n")
+        with open(doc_path, "wb") as f:
+            f.writelines(
+                orjson.dumps({"text": sent}, option=orjson.OPT_APPEND_NEWLINE)
+                for sent in chain(head, sentences)
+            )
 
         new_pdf_path = raw_dir / f"{kept_count:04d}_{id}.pdf"
         pdf_path.rename(new_pdf_path)
@@ -70,6 +160,7 @@ def main():
         kept_count += 1
         if kept_count >= args.num_docs:
             break
+    remaining.close()
 
     logger.info(f"Downloaded {kept_count} documents")
 
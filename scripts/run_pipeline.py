@@ -1,12 +1,14 @@
 import argparse
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
 import yaml
 from tqdm import tqdm
 
-from src.core.graph_builder import TranslationPipeline
+from src.core.graph_builder import get_pipeline
 
 # Setup logging
 format = "%(asctime)s - %(levelname)s: %(message)s"
@@ -14,6 +16,24 @@ logging.basicConfig(level=logging.INFO, format=format)
 logger = logging.getLogger(__name__)
 
 
+def process_one(input_graph_path: Path, translated_dir: Path, config: dict):
+    translator = get_pipeline(
+        source_lang=config["language"]["source"],
+        target_lang=config["language"]["target"],
+        config=config,
+    )
+
+    # Loading backtranslated data, so have to swap direction
+    input_data = translator.load_from_json(input_graph_path, swap_direction=True)
+    graph_save_dir = translated_dir / f"{input_graph_path.stem}.json"
+
+    translator.run(
+        source_sentences=input_data["source_sentences"],
+        graph_save_dir=graph_save_dir,
+        preloaded_state=input_data,
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(description="Run translation graph")
     parser.add_argument("--config", type=str, default="config/config.yaml")
@@ -37,25 +57,16 @@ def main():
     if not backtrans_dir.exists():
         raise ValueError("Use run_backtranslation to prepare documents first")
 
-    # Flip source/target because backtranslation
-    translator = TranslationPipeline(
-        source_lang=config["language"]["source"],
-        target_lang=config["language"]["target"],
-        config=config,
-    )
-
-    for input_graph_path in tqdm(
-        backtrans_dir.glob("*.json"), desc="Translating documents..."
-    ):
-        # Loading backtranslated data, so have to swap direction
-        input_data = translator.load_from_json(input_graph_path, swap_direction=True)
-        graph_save_dir = translated_dir / f"{input_graph_path.stem}.json"
-
-        translator.run(
-            source_sentences=input_data["source_sentences"],
-            graph_save_dir=graph_save_dir,
-            preloaded_state=input_data,
+    input_graph_paths = list(backtrans_dir.glob("*.json"))
+    with ThreadPoolExecutor(max_workers=config["concurrency"]["docs"]) as executor:
+        results = executor.map(
+            partial(process_one, translated_dir=translated_dir, config=config),
+            input_graph_paths,
         )
+        for _ in tqdm(
+            results, total=len(input_graph_paths), desc="Translating documents..."
+        ):
+            pass
 
 
 if __name__ == "__main__":
@@ -1,11 +1,18 @@
+import asyncio
+import threading
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from jinja2 import Environment, FileSystemLoader
-from openai import OpenAI
+import blake3
+import numpy as np
+import orjson
 from pydantic import BaseModel
 from tqdm import tqdm
 
+from src.core.embedding_cache import CachedEmbedder
+from src.core.llm_cache import CachedStructuredClient, template_tag
+from src.core.prompts import get_env
+
 
 class DiscourseDecision(BaseModel):
     decision: bool
@@ -15,24 +22,67 @@ class EdgeDecision(BaseModel):
     decision: bool
 
 
+# Shared by every agent in the process; the lock keeps pipelines built at the
+# same time in different threads from each loading their own copy
+_embedders: Dict[str, CachedEmbedder] = {}
+_embedders_lock = threading.Lock()
+
+
+def _load_embedder(model_name: str) -> CachedEmbedder:
+    with _embedders_lock:
+        if model_name not in _embedders:
+            _embedders[model_name] = CachedEmbedder(model_name)
+        return _embedders[model_name]
+
+
 class DependencyGraphAgent:
+    checkpoint_every = 100  # resolved edge decisions between checkpoint flushes
+
     def __init__(
-        self, client: OpenAI, model_name: str, max_discourse_length: int = 2048
+        self,
+        client: CachedStructuredClient,
+        model_name: str,
+        max_discourse_length: int = 2048,
+        max_concurrency: int = 32,
+        segment_lookahead: int = 4,
+        embedding_model: Optional[str] = None,
+        similarity_threshold: float = 0.35,
     ):
         self.client = client
         self.model_name = model_name
         self.max_discourse_length = max_discourse_length
+        self.max_concurrency = max_concurrency
+        self.segment_lookahead = segment_lookahead
+        self.similarity_threshold = similarity_threshold
+
+        # Cheap pre-filter for edge candidates, disabled without a model. Loaded
+        # on first use, preloaded graphs never need it
+        self.embedding_model = embedding_model
 
-        prompts_dir = Path("config/prompts")
-        env = Environment(loader=FileSystemLoader(prompts_dir))
+        # Kept for the agent's lifetime: the async client's connection pool is
+        # bound to the loop it was first used on
+        self._loop = asyncio.new_event_loop()
+
+        env = get_env()
         self.discourse_prompt_template = env.get_template("discourse.jinja")
         self.edge_prompt_template = env.get_template("edge.jinja")
+        self.discourse_tag = template_tag(self.discourse_prompt_template)
+        self.edge_tag = template_tag(self.edge_prompt_template)
 
     def generate_dependency_graph(
-        self, document_sentences: List[str]
+        self, document_sentences: List[str], checkpoint_path: Optional[Path] = None
     ) -> Tuple[List[str], List[Tuple[str, str]]]:
-        discourses = self._segment_discourses(document_sentences)
-        edges = self._find_edges(discourses)
+        try:
+            discourses = self._loop.run_until_complete(
+                self._segment_discourses_async(document_sentences)
+            )
+        except Exception as e:
+            print(f"Error during speculative segmentation, retrying serially: {e}")
+            discourses = self._segment_discourses(document_sentences)
+
+        edges = self._loop.run_until_complete(
+            self._find_edges_async(discourses, checkpoint_path)
+        )
         return discourses, edges
 
     def _segment_discourses(self, document_sentences: List[str]) -> List[str]:
@@ -54,12 +104,12 @@ class DependencyGraphAgent:
                             discourse=" ".join(discourse),
                             next_sentence=sentences[discourse_end_idx],
                         )
-                        response = self.client.beta.chat.completions.parse(
-                            model=self.model_name,
-                            messages=[{"role": "user", "content": prompt}],
-                            response_format=DiscourseDecision,
+                        result = self.client.parse(
+                            self.model_name,
+                            prompt,
+                            DiscourseDecision,
+                            tag=self.discourse_tag,
                         )
-                        result = response.choices[0].message.parsed
                         if result.decision:
                             discourse.append(sentences[discourse_end_idx])
                             discourse_end_idx += 1
@@ -73,36 +123,189 @@ class DependencyGraphAgent:
                 curr_sent_idx = discourse_end_idx
         return discourses
 
-    def _find_edges(self, discourses: List[str]) -> List[Tuple[str, str]]:
-        edges = list()
+    async def _segment_discourses_async(
+        self, document_sentences: List[str]
+    ) -> List[str]:
+        discourses = []
+        curr_sent_idx = 0
+        sentences = document_sentences
+
+        with tqdm(total=len(sentences), desc="Segmenting document") as pbar:
+            while curr_sent_idx < len(sentences):
+                discourse = [sentences[curr_sent_idx]]
+                discourse_end_idx = curr_sent_idx + 1
+
+                while discourse_end_idx < len(sentences):
+                    # Decide the next K sentences at once, each prompt assuming
+                    # every sentence before it was accepted
+                    prompts = []
+                    candidate = list(discourse)
+                    lookahead_end = min(
+                        discourse_end_idx + self.segment_lookahead, len(sentences)
+                    )
+                    for next_idx in range(discourse_end_idx, lookahead_end):
+                        if len(" ".join(candidate)) >= self.max_discourse_length:
+                            break
+                        prompts.append(
+                            self.discourse_prompt_template.render(
+                                discourse=" ".join(candidate),
+                                next_sentence=sentences[next_idx],
+                            )
+                        )
+                        candidate.append(sentences[next_idx])
+
+                    if not prompts:
+                        break
+
+                    results = await asyncio.gather(
+                        *[
+                            self.client.aparse(
+                                self.model_name,
+                                prompt,
+                                DiscourseDecision,
+                                tag=self.discourse_tag,
+                            )
+                            for prompt in prompts
+                        ]
+                    )
+
+                    # Keep the longest accepted prefix
+                    accepted = 0
+                    for result in results:
+                        if not result.decision:
+                            break
+                        accepted += 1
+
+                    discourse.extend(
+                        sentences[discourse_end_idx : discourse_end_idx + accepted]
+                    )
+                    discourse_end_idx += accepted
+                    if accepted < len(prompts):
+                        break
+
+                discourses.append(" ".join(discourse))
+                pbar.update(discourse_end_idx - curr_sent_idx)
+                curr_sent_idx = discourse_end_idx
+        return discourses
+
+    async def _find_edges_async(
+        self, discourses: List[str], checkpoint_path: Optional[Path] = None
+    ) -> List[Tuple[str, str]]:
         n = len(discourses)
-        total_comparisons = (n * (n - 1)) // 2 + (n - 1)
+        edges = [(uid, uid + 1) for uid in range(n - 1)]
+        candidates = self._candidate_pairs(discourses)
 
+        digest = blake3.blake3("\n".join(discourses).encode("utf-8")).hexdigest()
+        # Decisions from an interrupted run on the same discourses, limited to
+        # pairs that still pass the similarity gate in case its settings changed
+        candidate_set = set(candidates)
+        restored = self._load_edge_checkpoint(checkpoint_path, digest)
+        decided = {
+            pair: decision
+            for pair, decision in restored.items()
+            if pair in candidate_set
+        }
+
+        # Rendering is cheap, so build every pair prompt up front, truncating
+        # each discourse once rather than once per pair
+        truncated = [d[: self.max_discourse_length] for d in discourses]
+        render = self.edge_prompt_template.render
+        tasks = [
+            (uid, vid, render(discourse_1=truncated[uid], discourse_2=truncated[vid]))
+            for uid, vid in candidates
+            if (uid, vid) not in decided
+        ]
+        sem = asyncio.Semaphore(self.max_concurrency)
+        resolved = 0
+
+        total_comparisons = (n * (n - 1)) // 2
         with tqdm(total=total_comparisons, desc="Finding edges") as pbar:
-            for uid in range(len(discourses)):
-                if uid < len(discourses) - 1:
-                    edges.append((uid, uid + 1))
-                    pbar.update(1)
+            # Adjacent edges, pairs rejected by the similarity gate and pairs
+            # restored from the checkpoint
+            pbar.update(total_comparisons - len(tasks))
 
-                for vid in range(uid + 2, len(discourses)):
+            async def one(uid: int, vid: int, prompt: str):
+                nonlocal resolved
+                async with sem:
                     try:
-                        prompt = self.edge_prompt_template.render(
-                            discourse_1=discourses[uid][: self.max_discourse_length],
-                            discourse_2=discourses[vid][: self.max_discourse_length],
-                        )
-                        response = self.client.beta.chat.completions.parse(
-                            model=self.model_name,
-                            messages=[{"role": "user", "content": prompt}],
-                            response_format=EdgeDecision,
+                        result = await self.client.aparse(
+                            self.model_name, prompt, EdgeDecision, tag=self.edge_tag
                         )
-                        result = response.choices[0].message.parsed
-                        if result:
-                            if result.decision:
-                                edges.append((uid, vid))
+                        decided[(uid, vid)] = bool(result and result.decision)
+
+                        resolved += 1
+                        if resolved % self.checkpoint_every == 0:
+                            self._save_edge_checkpoint(checkpoint_path, digest, decided)
 
                     except Exception as e:
+                        # Left undecided so a resumed run retries the pair
                         print(f"Error during edge generation: {e}")
 
                     finally:
                         pbar.update(1)
-        return edges
+
+            await asyncio.gather(*[one(*t) for t in tasks])
+
+        edges.extend(pair for pair, decision in decided.items() if decision)
+
+        # Keep the checkpoint only while failed pairs remain to be retried
+        if checkpoint_path is not None:
+            if len(decided) < len(candidates):
+                self._save_edge_checkpoint(checkpoint_path, digest, decided)
+            else:
+                checkpoint_path.unlink(missing_ok=True)
+        return sorted(edges)
+
+    @staticmethod
+    def _load_edge_checkpoint(
+        checkpoint_path: Optional[Path], digest: str
+    ) -> Dict[Tuple[int, int], bool]:
+        if checkpoint_path is None or not checkpoint_path.exists():
+            return {}
+
+        try:
+            data = orjson.loads(checkpoint_path.read_bytes())
+        except orjson.JSONDecodeError as e:
+            print(f"Ignoring unreadable edge checkpoint: {e}")
+            return {}
+
+        # Segmentation changed since the checkpoint was written
+        if data.get("digest") != digest:
+            return {}
+        return {(uid, vid): decision for uid, vid, decision in data["decided"]}
+
+    @staticmethod
+    def _save_edge_checkpoint(
+        checkpoint_path: Optional[Path],
+        digest: str,
+        decided: Dict[Tuple[int, int], bool],
+    ) -> None:
+        if checkpoint_path is None:
+            return
+
+        data = {
+            "digest": digest,
+            "decided": [
+                [uid, vid, decision] for (uid, vid), decision in decided.items()
+            ],
+        }
+        tmp_path = checkpoint_path.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps(data))
+        tmp_path.replace(checkpoint_path)
+
+    def _candidate_pairs(self, discourses: List[str]) -> List[Tuple[int, int]]:
+        """Non-adjacent pairs worth an LLM edge decision"""
+        n = len(discourses)
+        pairs = [(uid, vid) for uid in range(n) for vid in range(uid + 2, n)]
+        if self.embedding_model is None or not pairs:
+            return pairs
+
+        # Stored as float16, upcast since NumPy has no fast float16 matmul
+        embedder = _load_embedder(self.embedding_model)
+        emb = embedder.encode(discourses, batch_size=64).astype(np.float32)
+        sim = emb @ emb.T
+        return [
+            (uid, vid)
+            for uid, vid in pairs
+            if sim[uid, vid] >= self.similarity_threshold
+        ]
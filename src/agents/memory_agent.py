@@ -1,12 +1,12 @@
-import json
 from dataclasses import dataclass
-from pathlib import Path
 from typing import Any, Dict, List, Optional, Type
 
-from jinja2 import Environment, FileSystemLoader
-from openai import OpenAI
+import orjson
 from pydantic import BaseModel
 
+from src.core.llm_cache import CachedStructuredClient, template_tag
+from src.core.prompts import get_env
+
 
 @dataclass
 class MemoryComponent:
@@ -34,8 +34,14 @@ class ContextSummaryResponse(BaseModel):
     summary: str
 
 
+class LocalMemoryResponse(BaseModel):
+    entity_map: List[Entity]
+    connective: Optional[str]
+    summary: str
+
+
 class MemoryAgent:
-    def __init__(self, client: OpenAI, model_name: str) -> None:
+    def __init__(self, client: CachedStructuredClient, model_name: str) -> None:
         self.client = client
         self.model_name = model_name
 
@@ -65,44 +71,52 @@ class MemoryAgent:
         self.memory: Dict[str, Any] = {}
 
     def _load_prompts(self):
-        prompts_dir = Path("config/prompts")
-        env = Environment(loader=FileSystemLoader(prompts_dir))
+        env = get_env()
         self.prompts = {
             component.name: env.get_template(f"memory/{component.name}.jinja")
             for component in self.components
         }
+        self.prompt_tags = {
+            name: template_tag(template) for name, template in self.prompts.items()
+        }
+        self.combined_prompt = env.get_template("memory/combined.jinja")
+        self.combined_tag = template_tag(self.combined_prompt)
 
     def reset_memory(self) -> None:
         self.memory = dict()
 
-    def _get_structured_response(self, prompt: str, response_format: Type[BaseModel]):
+    def _get_structured_response(
+        self,
+        prompt: str,
+        response_format: Type[BaseModel],
+        tag: Optional[str] = None,
+    ):
         try:
-            response = self.client.beta.chat.completions.parse(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
-                response_format=response_format,
-            )
-            return response.choices[0].message.parsed
+            return self.client.parse(self.model_name, prompt, response_format, tag=tag)
         except Exception as e:
             print(f"Error getting structured response (memory): {e}")
             return None
 
-    def _extract_entity_mapping(self, prompt: str) -> Dict[str, str]:
-        result = self._get_structured_response(prompt, EntityMappingResponse)
+    def _extract_entity_mapping(
+        self, prompt: str, tag: Optional[str] = None
+    ) -> Dict[str, str]:
+        result = self._get_structured_response(prompt, EntityMappingResponse, tag)
         if isinstance(result, EntityMappingResponse) and result.entity_map:
             return {
                 entity.source_term: entity.target_term for entity in result.entity_map
             }
         return {}
 
-    def _extract_discourse_connective(self, prompt: str) -> str:
-        result = self._get_structured_response(prompt, DiscourseConnectiveResponse)
+    def _extract_discourse_connective(
+        self, prompt: str, tag: Optional[str] = None
+    ) -> str:
+        result = self._get_structured_response(prompt, DiscourseConnectiveResponse, tag)
         if isinstance(result, DiscourseConnectiveResponse) and result.connective:
             return result.connective
         return ""
 
-    def _extract_context_summary(self, prompt: str) -> str:
-        result = self._get_structured_response(prompt, ContextSummaryResponse)
+    def _extract_context_summary(self, prompt: str, tag: Optional[str] = None) -> str:
+        result = self._get_structured_response(prompt, ContextSummaryResponse, tag)
         if isinstance(result, ContextSummaryResponse) and result.summary:
             return result.summary
         return ""
@@ -116,6 +130,35 @@ class MemoryAgent:
             "context_summary": "",
         }
 
+        # All components in a single round-trip
+        prompt = self.combined_prompt.render(
+            source_discourse=discourse,
+            target_discourse=translation,
+            source_lang=source_lang,
+            target_lang=target_lang,
+        )
+        result = self._get_structured_response(
+            prompt, LocalMemoryResponse, self.combined_tag
+        )
+        if isinstance(result, LocalMemoryResponse):
+            contents = {
+                "entity_mapping": {
+                    entity.source_term: entity.target_term
+                    for entity in result.entity_map
+                },
+                "discourse_connectives": result.connective or "",
+                "context_summary": result.summary or "",
+            }
+            for component in self.components:
+                key_name = (
+                    f"{component.name}_mapping"
+                    if component.returns_mapping
+                    else component.name
+                )
+                local_memory[key_name] = contents[component.name]
+            return local_memory
+
+        # Fall back to one call per component for models that fail the schema
         for component in self.components:
             try:
                 prompt = self.prompts[component.name].render(
@@ -125,12 +168,13 @@ class MemoryAgent:
                     target_lang=target_lang,
                 )
 
+                tag = self.prompt_tags[component.name]
                 if component.response_format == EntityMappingResponse:
-                    content = self._extract_entity_mapping(prompt)
+                    content = self._extract_entity_mapping(prompt, tag)
                 elif component.response_format == DiscourseConnectiveResponse:
-                    content = self._extract_discourse_connective(prompt)
+                    content = self._extract_discourse_connective(prompt, tag)
                 elif component.response_format == ContextSummaryResponse:
-                    content = self._extract_context_summary(prompt)
+                    content = self._extract_context_summary(prompt, tag)
                 else:
                     content = {} if component.returns_mapping else ""
 
@@ -182,10 +226,7 @@ class MemoryAgent:
                 continue
 
             if component.returns_mapping and isinstance(content, dict):
-                items = content.items()
-                json_str = json.dumps(
-                    dict(items), separators=(",", ":"), ensure_ascii=False
-                )
+                json_str = orjson.dumps(content).decode("utf-8")
                 parts.append(f"{component.display_string}:{json_str}")
             elif isinstance(content, str):
                 clean_content = content.strip()
@@ -1,17 +1,19 @@
-from pathlib import Path
+import logging
 from typing import Optional
 
-from jinja2 import Environment, FileSystemLoader
 from openai import OpenAI
 
+from src.core.prompts import get_env
+
+logger = logging.getLogger(__name__)
+
 
 class TranslationAgent:
     def __init__(self, client: OpenAI, model_name: str) -> None:
         self.client = client
         self.model_name = model_name
 
-        prompts_dir = Path("config/prompts")
-        env = Environment(loader=FileSystemLoader(prompts_dir))
+        env = get_env()
         self.translation_prompt_template = env.get_template("translation.jinja")
 
     def translate(
@@ -33,9 +35,7 @@ class TranslationAgent:
             rag_context=rag_snippets_str,
         )
 
-        print(len(prompt))
-        print(len(prompt.split(" ")))
-        print()
+        logger.debug("prompt chars=%d", len(prompt))
 
         try:
             response = self.client.chat.completions.create(
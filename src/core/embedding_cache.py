@@ -0,0 +1,43 @@
+from pathlib import Path
+from typing import List
+
+import blake3
+import numpy as np
+from diskcache import Cache
+
+DEFAULT_CACHE_DIR = Path("~/.cache/sal_embed").expanduser()
+
+
+class CachedEmbedder:
+    """Sentence-transformer embeddings with an on-disk text -> vector cache"""
+
+    def __init__(self, model_name: str, cache_dir: Path = DEFAULT_CACHE_DIR) -> None:
+        # Imported here so torch is only loaded when the similarity gate is on
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.cache = Cache(str(cache_dir))
+
+    def _key(self, text: str) -> str:
+        raw = f"{self.model_name}|{text}"
+        return blake3.blake3(raw.encode("utf-8")).hexdigest()
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Normalized float16 embeddings, one row per text"""
+        keys = [self._key(text) for text in texts]
+        vectors = [self.cache.get(key) for key in keys]
+
+        missing = [i for i, vec in enumerate(vectors) if vec is None]
+        if missing:
+            encoded = self.model.encode(
+                [texts[i] for i in missing],
+                batch_size=batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+            ).astype(np.float16)
+            for i, vec in zip(missing, encoded):
+                self.cache.set(keys[i], vec)
+                vectors[i] = vec
+
+        return np.stack(vectors)
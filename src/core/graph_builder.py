@@ -1,18 +1,26 @@
-import json
 import logging
+import threading
+from collections import defaultdict
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import blake3
+import httpx
+import orjson
 from langgraph.graph import END, StateGraph
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
 
 from src.agents.dependency_graph_agent import DependencyGraphAgent
 from src.agents.memory_agent import MemoryAgent
 from src.agents.translation_agent import TranslationAgent
+from src.core.llm_cache import CachedStructuredClient
 from src.core.state import DiscourseUnit, GraphState
 
 logger = logging.getLogger(__name__)
 
+# Pipelines own an event loop and async clients, so they are cached per thread
+_local = threading.local()
+
 
 class TranslationPipeline:
     def __init__(self, source_lang: str, target_lang: str, config: dict):
@@ -20,22 +28,47 @@ class TranslationPipeline:
         self.source_lang = source_lang
         self.target_lang = target_lang
 
-        # Setup clients
+        # Setup clients, sharing one HTTP/2 connection pool per sync/async side
+        limits = httpx.Limits(max_connections=256, max_keepalive_connections=256)
+        self.http_client = DefaultHttpxClient(http2=True, limits=limits)
+        self.async_http_client = DefaultAsyncHttpxClient(http2=True, limits=limits)
+
         self.proc_client = OpenAI(
             base_url=config["processing"]["base_url"],
             api_key=config["processing"]["api_key"],
+            http_client=self.http_client,
+        )
+        self.proc_async_client = AsyncOpenAI(
+            base_url=config["processing"]["base_url"],
+            api_key=config["processing"]["api_key"],
+            http_client=self.async_http_client,
         )
         self.trans_client = OpenAI(
             base_url=config["translation"]["base_url"],
             api_key=config["translation"]["api_key"],
+            http_client=self.http_client,
         )
 
         # Initialize core agents
         model_proc = config["processing"]["model_name"]
         model_trans = config["translation"]["model_name"]
 
-        self.dep_agent = DependencyGraphAgent(self.proc_client, model_proc)
-        self.mem_agent = MemoryAgent(self.proc_client, model_proc)
+        # Structured (JSON) calls to the processing model go through the cache
+        self.proc_cache = CachedStructuredClient(
+            self.proc_client, self.proc_async_client
+        )
+
+        self.dep_agent = DependencyGraphAgent(
+            self.proc_cache,
+            model_proc,
+            max_concurrency=config["processing"].get("max_concurrency", 32),
+            segment_lookahead=config["processing"].get("segment_lookahead", 4),
+            embedding_model=config["processing"].get("embedding_model"),
+            similarity_threshold=config["processing"].get(
+                "edge_similarity_threshold", 0.35
+            ),
+        )
+        self.mem_agent = MemoryAgent(self.proc_cache, model_proc)
         self.trans_agent = TranslationAgent(self.trans_client, model_trans)
 
         # Initialize optional agents based on config
@@ -58,35 +91,13 @@ class TranslationPipeline:
 
         # --- Add Nodes ---
         workflow.add_node("dependency_graph", self.node_dependency)
-        workflow.add_node("prepare_memory", self.node_memory)
         workflow.add_node("translate", self.node_translate)
         workflow.add_node("finalize", self.node_finalize)
 
-        if self.term_agent:
-            workflow.add_node("terminology", self.node_terminology)
-        if self.rag_agent:
-            workflow.add_node("rag", self.node_rag)
-
         # --- Define edges ---
         workflow.set_entry_point("dependency_graph")
-        workflow.add_edge("dependency_graph", "prepare_memory")
-        current_node = "prepare_memory"
-
-        if self.term_agent:
-            workflow.add_edge(current_node, "terminology")
-            current_node = "terminology"
-
-        if self.rag_agent:
-            workflow.add_edge(current_node, "rag")
-            current_node = "rag"
-
-        workflow.add_edge(current_node, "translate")
-
-        workflow.add_conditional_edges(
-            "translate",
-            self._check_if_done,
-            {"continue": "prepare_memory", "done": "finalize"},
-        )
+        workflow.add_edge("dependency_graph", "translate")
+        workflow.add_edge("translate", "finalize")
         workflow.add_edge("finalize", END)
         return workflow.compile()
 
@@ -97,11 +108,14 @@ class TranslationPipeline:
             return {
                 "discourses": state["discourses"],
                 "edges": state["edges"],
-                "current_index": 0,
+                "incoming": self._index_incoming(state["edges"]),
             }
 
         sentences = state["source_sentences"]
-        discourses, edges = self.dep_agent.generate_dependency_graph(sentences)
+        checkpoint_path = Path(state["graph_save_dir"]).with_suffix(".edges.ckpt")
+        discourses, edges = self.dep_agent.generate_dependency_graph(
+            sentences, checkpoint_path
+        )
 
         units = [
             DiscourseUnit(
@@ -118,30 +132,42 @@ class TranslationPipeline:
         return {
             "discourses": units,
             "edges": edges,
-            "current_index": 0,
+            "incoming": self._index_incoming(edges),
         }
 
-    def node_memory(self, state: GraphState):
-        idx = state["current_index"]
-        incident_indices = [uid for uid, vid in state["edges"] if vid == idx]
-        incident_mems = [
-            state["discourses"][uid]["local_memory"] for uid in incident_indices
-        ]
-        aggregated_mem = self.mem_agent.get_incident_memory(incident_mems)
-        state["discourses"][idx]["incident_memory"] = aggregated_mem
-        return {"discourses": state["discourses"]}
-
-    def node_terminology(self, state: GraphState):
+    def unit_terminology(self, unit: DiscourseUnit) -> DiscourseUnit:
         raise NotImplementedError
 
-    def node_rag(self, state: GraphState):
+    def unit_rag(self, unit: DiscourseUnit) -> DiscourseUnit:
         raise NotImplementedError
 
     def node_translate(self, state: GraphState):
-        idx = state["current_index"]
-        unit = state["discourses"][idx]
+        """Translate discourses in order, each after the units it depends on"""
+        discourses = list(state["discourses"])
+        incoming = state["incoming"]
+
+        for idx in range(len(discourses)):
+            incident_mems = [
+                discourses[uid]["local_memory"] for uid in incoming.get(idx, [])
+            ]
+            discourses[idx] = self._translate_unit(discourses[idx], incident_mems)
+
+            if (idx + 1) % 10 == 0:
+                logger.info(f"Translated segment {idx + 1}/{len(discourses)}")
+
+        return {"discourses": discourses}
 
-        memory_str = self.mem_agent.encode_memory(unit["incident_memory"])
+    def _translate_unit(
+        self, unit: DiscourseUnit, incident_mems: List[Dict[str, Any]]
+    ) -> DiscourseUnit:
+        aggregated_mem = self.mem_agent.get_incident_memory(incident_mems)
+        memory_str = self.mem_agent.encode_memory(aggregated_mem)
+
+        # Optional modules run per unit, between memory and translation
+        if self.term_agent:
+            unit = self.unit_terminology(unit)
+        if self.rag_agent:
+            unit = self.unit_rag(unit)
 
         terminology_str = (
             self.term_agent.encode_terminology() if self.term_agent else None
@@ -156,7 +182,6 @@ class TranslationPipeline:
             terminology_str=terminology_str,
             rag_snippets_str=rag_str,
         )
-        state["discourses"][idx]["target_text"] = translation
 
         # Extract local memory
         local_mem = self.mem_agent.get_local_memory(
@@ -165,12 +190,12 @@ class TranslationPipeline:
             source_lang=self.source_lang,
             target_lang=self.target_lang,
         )
-        state["discourses"][idx]["local_memory"] = local_mem
-
-        if (idx + 1) % 10 == 0:
-            logger.info(f"Translated segment {idx + 1}/{len(state['discourses'])}")
-
-        return {"discourses": state["discourses"], "current_index": idx + 1}
+        return {
+            **unit,
+            "incident_memory": aggregated_mem,
+            "target_text": translation,
+            "local_memory": local_mem,
+        }
 
     def node_finalize(self, state: GraphState):
         translations = [d["target_text"] for d in state["discourses"]]
@@ -189,17 +214,23 @@ class TranslationPipeline:
         }
 
         # Save to disk
-        with open(state["graph_save_dir"], "w", encoding="utf-8") as f:
-            json.dump(output_data, f, indent=4, ensure_ascii=False)
+        with open(state["graph_save_dir"], "wb") as f:
+            f.write(
+                orjson.dumps(
+                    output_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                )
+            )
 
         return {"target_document": target_doc, "target_sentences": translations}
 
-    def _check_if_done(self, state: GraphState):
-        if state["current_index"] < len(state["discourses"]):
-            return "continue"
-        return "done"
-
     # ---- Helpers ----
+    @staticmethod
+    def _index_incoming(edges: List[Tuple[int, int]]) -> Dict[int, List[int]]:
+        incoming = defaultdict(list)
+        for uid, vid in edges:
+            incoming[vid].append(uid)
+        return dict(incoming)
+
     def run(
         self,
         source_sentences: List[str],
@@ -211,7 +242,7 @@ class TranslationPipeline:
             source_sentences=source_sentences,
             discourses=(preloaded_state or {}).get("discourses") or [],
             edges=(preloaded_state or {}).get("edges") or [],
-            current_index=0,
+            incoming={},
             target_document="",
             target_sentences=[],
             graph_save_dir=graph_save_dir,
@@ -221,8 +252,7 @@ class TranslationPipeline:
 
     @staticmethod
     def load_from_json(json_path: Path, swap_direction: bool = False) -> dict:
-        with json_path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = orjson.loads(json_path.read_bytes())
 
         discourses = []
         for d in data.get("discourses", []):
@@ -254,3 +284,19 @@ class TranslationPipeline:
             "discourses": discourses,
             "edges": data.get("edges", []),
         }
+
+
+def get_pipeline(
+    source_lang: str, target_lang: str, config: dict
+) -> TranslationPipeline:
+    """Pipeline for the calling thread, built once per language pair and config"""
+    config_hash = blake3.blake3(
+        orjson.dumps(config, option=orjson.OPT_SORT_KEYS)
+    ).hexdigest()
+    key = (source_lang, target_lang, config_hash)
+
+    if not hasattr(_local, "pipelines"):
+        _local.pipelines = {}
+    if key not in _local.pipelines:
+        _local.pipelines[key] = TranslationPipeline(source_lang, target_lang, config)
+    return _local.pipelines[key]
@@ -0,0 +1,106 @@
+from pathlib import Path
+from typing import Optional, Type, TypeVar
+
+import blake3
+from diskcache import Cache
+from jinja2 import Template
+from openai import AsyncOpenAI, OpenAI
+from pydantic import BaseModel, ValidationError
+
+ResponseT = TypeVar("ResponseT", bound=BaseModel)
+
+DEFAULT_CACHE_DIR = Path("~/.cache/sal_llm").expanduser()
+DEFAULT_EXPIRE = 7 * 86400  # seconds
+
+
+def template_tag(template: Template) -> str:
+    """Version tag for a prompt template, changes whenever its source is edited"""
+    source = Path(template.filename).read_bytes()
+    return f"{template.name}:{blake3.blake3(source).hexdigest(length=8)}"
+
+
+class CachedStructuredClient:
+    """Structured-output completions with an on-disk prompt -> response cache"""
+
+    def __init__(
+        self,
+        client: OpenAI,
+        async_client: Optional[AsyncOpenAI] = None,
+        cache_dir: Path = DEFAULT_CACHE_DIR,
+        expire: int = DEFAULT_EXPIRE,
+    ) -> None:
+        self.client = client
+        self.async_client = async_client
+        self.cache = Cache(str(cache_dir))
+        self.expire = expire
+
+    @staticmethod
+    def _key(model: str, prompt: str, response_format: Type[BaseModel]) -> str:
+        raw = f"{model}|{response_format.__name__}|{prompt}"
+        return blake3.blake3(raw.encode("utf-8")).hexdigest()
+
+    def _lookup(
+        self, key: str, response_format: Type[ResponseT]
+    ) -> Optional[ResponseT]:
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        try:
+            return response_format.model_validate_json(cached)
+        except ValidationError:
+            # Written under an older version of the schema, re-query instead
+            self.cache.delete(key)
+            return None
+
+    def _store(
+        self, key: str, parsed: Optional[ResponseT], tag: Optional[str]
+    ) -> Optional[ResponseT]:
+        # Refusals / unparsable responses are not cached so they get retried
+        if parsed is not None:
+            self.cache.set(key, parsed.model_dump_json(), expire=self.expire, tag=tag)
+        return parsed
+
+    def parse(
+        self,
+        model: str,
+        prompt: str,
+        response_format: Type[ResponseT],
+        tag: Optional[str] = None,
+    ) -> Optional[ResponseT]:
+        key = self._key(model, prompt, response_format)
+        cached = self._lookup(key, response_format)
+        if cached is not None:
+            return cached
+
+        response = self.client.beta.chat.completions.parse(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format=response_format,
+        )
+        return self._store(key, response.choices[0].message.parsed, tag)
+
+    async def aparse(
+        self,
+        model: str,
+        prompt: str,
+        response_format: Type[ResponseT],
+        tag: Optional[str] = None,
+    ) -> Optional[ResponseT]:
+        if self.async_client is None:
+            raise RuntimeError("CachedStructuredClient has no async client")
+
+        key = self._key(model, prompt, response_format)
+        cached = self._lookup(key, response_format)
+        if cached is not None:
+            return cached
+
+        response = await self.async_client.beta.chat.completions.parse(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format=response_format,
+        )
+        return self._store(key, response.choices[0].message.parsed, tag)
+
+    def evict(self, tag: str) -> int:
+        """Drop every cached response produced with a given template version"""
+        return self.cache.evict(tag)
@@ -0,0 +1,14 @@
+from functools import lru_cache
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader
+
+PROMPTS_DIR = Path("config/prompts")
+
+
+@lru_cache(maxsize=1)
+def get_env() -> Environment:
+    """Jinja environment for the prompt templates, shared by every agent"""
+    return Environment(
+        loader=FileSystemLoader(PROMPTS_DIR), auto_reload=False, cache_size=1000
+    )
@@ -16,7 +16,7 @@ class GraphState(TypedDict):
     # Graph structure
     discourses: List[DiscourseUnit]
     edges: List[tuple[int, int]]  # (uid, vid)
-    current_index: int
+    incoming: Dict[int, List[int]]  # vid -> [uid, ...]
 
     # Output
     target_document: str
@@ -1,13 +1,26 @@
+import asyncio
 import logging
-import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, suppress
 from pathlib import Path
+from typing import Iterator, List, Optional
 
+import aiofiles
+import aiohttp
+import blake3
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
+from tqdm import tqdm
 
 logger = logging.getLogger(__name__)
 
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+CHUNK_SIZE = 64 * 1024
+
 
 def setup_pdf_driver(download_dir: Path):
     """Configure Chrome WebDriver for PDF downloads."""
@@ -15,9 +28,7 @@ def setup_pdf_driver(download_dir: Path):
     options.add_argument("--headless")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
-    options.add_argument(
-        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    )
+    options.add_argument(f"--user-agent={USER_AGENT}")
     options.add_experimental_option(
         "prefs",
         {
@@ -31,15 +42,133 @@ def setup_pdf_driver(download_dir: Path):
     return webdriver.Chrome(options=options)
 
 
-def download_pdf(pdf_url: str, driver: webdriver.Chrome) -> bool:
-    """Download a single PDF using Selenium."""
+@contextmanager
+def pdf_driver(download_dir: Path) -> Iterator[webdriver.Chrome]:
+    """Chrome WebDriver shared by a batch of downloads, quit afterwards."""
+    driver = setup_pdf_driver(download_dir)
+    try:
+        yield driver
+    finally:
+        # The session may already have died
+        with suppress(WebDriverException):
+            driver.quit()
+
+
+def download_pdf_browser(
+    pdf_url: str, driver: webdriver.Chrome, download_dir: Path
+) -> Optional[Path]:
+    """Download a single PDF using Selenium, returning the downloaded file."""
+    existing = set(download_dir.glob("*.pdf"))
+    sizes = {}
+
+    def finished(_) -> Optional[Path]:
+        # Chrome renames the .crdownload file once the transfer completes; also
+        # require its size to hold for one poll in case it is still flushing
+        for path in download_dir.glob("*.pdf"):
+            if path in existing:
+                continue
+            size = path.stat().st_size
+            if size and sizes.get(path) == size:
+                return path
+            sizes[path] = size
+        return None
+
     try:
         driver.get(pdf_url)
-        WebDriverWait(driver, 10).until(
-            lambda d: d.execute_script("return document.readyState") == "complete"
+        return WebDriverWait(
+            driver, 30, poll_frequency=0.2, ignored_exceptions=(FileNotFoundError,)
+        ).until(finished)
+    except Exception as e:
+        logger.error(f"Failed to download PDF: {e}")
+        return None
+
+
+def download_pdfs_browser(
+    pdf_urls: List[str], download_dir: Path, num_drivers: int = 4
+) -> List[str]:
+    """Download PDFs through a pool of browsers, returning the URLs that failed."""
+    if not pdf_urls:
+        return []
+
+    # One slot per browser, each with its own download directory as Chrome
+    # needs; browsers start on first use and a dead one is replaced the same way
+    slots = queue.Queue()
+    for i in range(max(1, min(num_drivers, len(pdf_urls)))):
+        driver_dir = download_dir / f".browser_{i}"
+        driver_dir.mkdir(exist_ok=True)
+        slots.put((driver_dir, None))
+
+    stack = ExitStack()
+    stack_lock = threading.Lock()
+
+    def reset(driver: Optional[webdriver.Chrome]) -> Optional[webdriver.Chrome]:
+        if driver is None:
+            return None
+        try:
+            driver.delete_all_cookies()
+            return driver
+        except WebDriverException as e:
+            logger.error(f"Dropping dead browser session: {e}")
+            return None
+
+    def one(pdf_url: str) -> bool:
+        driver_dir, driver = slots.get()
+        try:
+            if driver is None:
+                with stack_lock:
+                    driver = stack.enter_context(pdf_driver(driver_dir))
+
+            # Drop leftovers from an earlier download that timed out; deleting
+            # its .crdownload also stops Chrome from finishing it later
+            for path in driver_dir.iterdir():
+                path.unlink(missing_ok=True)
+
+            path = download_pdf_browser(pdf_url, driver, driver_dir)
+            if path is None:
+                return False
+            path.replace(download_dir / pdf_filename(pdf_url))
+            return True
+        except Exception as e:
+            logger.error(f"Failed to download PDF: {e}")
+            return False
+        finally:
+            # The slot always goes back, so waiting tasks can't starve
+            slots.put((driver_dir, reset(driver)))
+
+    with stack, ThreadPoolExecutor(max_workers=slots.qsize()) as executor:
+        results = list(
+            tqdm(
+                executor.map(one, pdf_urls),
+                total=len(pdf_urls),
+                desc="Downloading documents (browser)",
+            )
         )
-        time.sleep(5)
+
+    return [url for url, ok in zip(pdf_urls, results) if not ok]
+
+
+def pdf_filename(pdf_url: str) -> str:
+    """Stable file name for a directly downloaded PDF."""
+    return f"{blake3.blake3(pdf_url.encode('utf-8')).hexdigest(length=8)}.pdf"
+
+
+async def download_pdf(
+    pdf_url: str, session: aiohttp.ClientSession, dest: Path
+) -> bool:
+    """Stream a single PDF straight to disk."""
+    try:
+        async with session.get(pdf_url, headers={"User-Agent": USER_AGENT}) as response:
+            content_type = response.headers.get("Content-Type", "")
+            if response.status != 200 or "application/pdf" not in content_type:
+                logger.debug(f"No direct PDF at {pdf_url} ({response.status})")
+                return False
+
+            async with aiofiles.open(dest, "wb") as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    await f.write(chunk)
         return True
-    except Exception as e:
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error(f"Failed to download PDF: {e}")
+        dest.unlink(missing_ok=True)
         return False
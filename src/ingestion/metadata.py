@@ -1,13 +1,22 @@
+import asyncio
 import random
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
+import aiohttp
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+OPENALEX_URL = "https://api.openalex.org/works"
+MAX_PAGE_ATTEMPTS = 5  # tries per page before metadata collection stops
+BACKOFF_FACTOR = 1.5  # seconds, doubled after each failed attempt
+RETRY_STATUSES = (429, 500, 502, 503, 504)
 
-def fetch_openalex_metadata(lang_code: str, max_articles: int) -> List[Dict]:
-    url = "https://api.openalex.org/works"
-    params = {
+
+def _openalex_params(lang_code: str) -> Dict:
+    return {
         "filter": f"language:{lang_code},type:article",
         "select": "primary_location,title,doi,publication_date",
         "mailto": "example@email.com",
@@ -15,45 +24,141 @@ def fetch_openalex_metadata(lang_code: str, max_articles: int) -> List[Dict]:
         "cursor": "*",
     }
 
+
+def _is_transient(error: Exception) -> bool:
+    # Client errors other than rate limiting won't go away on retry
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES
+    return True
+
+
+def _to_article(result: Dict) -> Optional[Dict]:
+    # OpenAlex often returns a null primary_location
+    primary_location = result.get("primary_location") or {}
+    pdf_url = primary_location.get("pdf_url")
+
+    if not pdf_url:
+        return None
+
+    return {
+        "title": result.get("title"),
+        "pdf_url": pdf_url,
+        "doi": result.get("doi"),
+        "publication_date": result.get("publication_date"),
+    }
+
+
+def fetch_openalex_metadata(lang_code: str, max_articles: int) -> List[Dict]:
+    params = _openalex_params(lang_code)
+
+    # Reuse one connection to OpenAlex across pages, retrying transient errors
     session = requests.Session()
+    retries = Retry(
+        total=MAX_PAGE_ATTEMPTS,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET"],
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+    session.mount("https://", adapter)
+
     article_data = []
     total_articles = 0
-    next_cursor = 0
+    failed_attempts = 0
 
     while total_articles < max_articles:
-        response = session.get(url, params=params)
-
+        # Only the network and decoding steps are retried; a bad record is
+        # handled by _to_article instead of discarding the rest of the page
         try:
-            if "next_cursor" not in response.json()["meta"]:
+            response = session.get(OPENALEX_URL, params=params)
+            response.raise_for_status()
+            payload = orjson.loads(response.content)
+            meta = payload.get("meta", {})
+            results = payload["results"]
+        except (KeyError, ValueError, requests.RequestException) as e:
+            print(f"Error downloading article info: {str(e)}")
+            # The adapter already retried transient statuses, so give up on a
+            # page that keeps failing instead of looping on it forever
+            failed_attempts += 1
+            if failed_attempts >= MAX_PAGE_ATTEMPTS:
                 break
+            time.sleep(random.randint(4, 6))
+            continue
+        failed_attempts = 0
 
-            next_cursor = response.json()["meta"]["next_cursor"]
-            results = response.json()["results"]
+        if "next_cursor" not in meta:
+            break
 
-            for result in results:
-                primary_location = result["primary_location"]
-                pdf_url = primary_location.get("pdf_url", "")
+        for result in results:
+            article = _to_article(result)
+            if article is None:
+                continue
 
-                if not pdf_url:
-                    continue
+            article_data.append(article)
 
-                article_data.append(
-                    {
-                        "title": result["title"],
-                        "pdf_url": pdf_url,
-                        "doi": result["doi"],
-                        "publication_date": result["publication_date"],
-                    }
-                )
-
-                total_articles += 1
-                if total_articles >= max_articles:
-                    break
+            total_articles += 1
+            if total_articles >= max_articles:
+                break
 
-        except Exception as e:
-            print(f"Error downloading article info: {str(e)}")
+        # A null cursor marks the last page
+        if not meta["next_cursor"]:
+            break
 
-        params["cursor"] = next_cursor
+        params["cursor"] = meta["next_cursor"]
         time.sleep(random.randint(4, 6))
 
     return article_data
+
+
+async def fetch_openalex_metadata_async(
+    lang_code: str, max_articles: int, queue: Optional[asyncio.Queue] = None
+) -> List[Dict]:
+    """Fetch article metadata, also feeding each article to `queue` if given."""
+    params = _openalex_params(lang_code)
+    article_data = []
+
+    connector = aiohttp.TCPConnector(limit=8)
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def get_page() -> Tuple[Dict, List[Dict]]:
+            async with session.get(OPENALEX_URL, params=params) as response:
+                response.raise_for_status()
+                payload = orjson.loads(await response.read())
+            return payload.get("meta", {}), payload["results"]
+
+        while len(article_data) < max_articles:
+            for attempt in range(MAX_PAGE_ATTEMPTS):
+                # The polite delay overlaps the request instead of following it
+                try:
+                    (meta, results), _ = await asyncio.gather(
+                        get_page(), asyncio.sleep(random.uniform(4, 6))
+                    )
+                    break
+                except (
+                    aiohttp.ClientError,
+                    asyncio.TimeoutError,
+                    KeyError,
+                    ValueError,
+                ) as e:
+                    print(f"Error downloading article info: {str(e)}")
+                    if attempt + 1 == MAX_PAGE_ATTEMPTS or not _is_transient(e):
+                        return article_data
+                    await asyncio.sleep(BACKOFF_FACTOR * 2**attempt)
+
+            for result in results:
+                article = _to_article(result)
+                if article is None:
+                    continue
+
+                article_data.append(article)
+                if queue is not None:
+                    await queue.put(article)
+                if len(article_data) >= max_articles:
+                    break
+
+            next_cursor = meta.get("next_cursor")
+            if not next_cursor:
+                break
+            params["cursor"] = next_cursor
+
+    return article_data
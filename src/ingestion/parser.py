@@ -1,21 +1,52 @@
 import logging
+import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache, lru_cache
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import fitz
 import nltk
-from lingua import LanguageDetectorBuilder
+from lingua import IsoCode639_1, LanguageDetector, LanguageDetectorBuilder
 from nltk.tokenize import sent_tokenize
 
 logger = logging.getLogger(__name__)
 
+DETECT_BATCH_SIZE = 256  # sentences per parallel language detection call
+DETECT_CACHE_SIZE = 100_000  # detected sentences remembered across documents
+MIN_DETECT_CHARS = 20  # shorter sentences skip language detection
+MIN_DETECT_WORDS = 3  # as do sentences with fewer alphabetic runs
+MIN_ALPHA_RATIO = 0.5  # sentences with a lower share of letters are dropped
+
+# Line breaks become spaces, then runs of spaces/tabs left by layout collapse
+_NL_TRANS = str.maketrans({"\n": " ", "\r": " "})
+_WS_RE = re.compile(r"[ \t]{2,}")
+
+# Letters in any script (Vietnamese included), not digits or "_"; a str
+# pattern since bytes patterns only know ASCII letters
+_LETTER_RE = re.compile(r"[^\W\d_]")
+_WORD_RE = re.compile(r"[^\W\d_]{3,}")
+
+# (language codes, whitespace-normalized sentence) -> detected code, in LRU order
+_DETECT_CACHE: "OrderedDict[Tuple[Tuple[str, ...], str], Optional[str]]" = OrderedDict()
+
+
+@lru_cache(maxsize=None)
+def _get_detector(iso_codes: Tuple[str, ...]) -> LanguageDetector:
+    # Loading n-gram models is expensive, so build each detector once per process
+    languages = [IsoCode639_1.from_str(code) for code in iso_codes]
+    return LanguageDetectorBuilder.from_iso_codes_639_1(*languages).build()
+
 
 def detect_language(text: str, detector):
     result = detector.detect_language_of(text)
     return result.iso_code_639_1.name.lower() if result else None
 
 
+@cache
 def _ensure_punkt():
+    # Searching nltk.data.path once per process is enough
     for resource in ("punkt", "punkt_tab"):
         try:
             nltk.data.find(f"tokenizers/{resource}")
@@ -26,14 +57,10 @@ def _ensure_punkt():
 def extract_text(pdf_path: Path) -> str:
     try:
         doc = fitz.open(pdf_path)
-        full_text = []
-
-        for page in doc:
-            blocks = page.get_text("blocks", sort=True)
-            for b in blocks:
-                clean_block = b[4].replace("\n", " ").strip()
-                full_text.append(clean_block)
-        doc_text = "\n".join(full_text)
+        # Let MuPDF assemble each page's text, then clean the whole document once
+        pages = [page.get_text("text", sort=True) for page in doc]
+        doc_text = "\n".join(pages)
+        doc_text = _WS_RE.sub(" ", doc_text.translate(_NL_TRANS)).strip()
         doc.close()
 
         if not isinstance(doc_text, str):
@@ -46,22 +73,87 @@ def extract_text(pdf_path: Path) -> str:
         return ""
 
 
-def clean_text(document_text: str, target_lang: str, ignore_lang: str) -> List[str]:
+def parse_many(
+    pdf_paths: List[Path], max_workers: Optional[int] = None, chunksize: int = 8
+) -> Iterator[str]:
+    """Extract text from many PDFs in parallel, yielding in input order."""
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            yield from executor.map(extract_text, pdf_paths, chunksize=chunksize)
+        finally:
+            # Closing the generator early drops PDFs not yet started
+            executor.shutdown(cancel_futures=True)
+
 
-    # Check entire doc first
-    detector = LanguageDetectorBuilder.from_all_languages().build()
+def clean_text(
+    document_text: str, target_lang: str, ignore_lang: str, assume_target: bool = False
+) -> Iterator[str]:
 
-    detected_code = detect_language(document_text, detector)
-    if detected_code != target_lang:
-        return [""]
+    # Only profiles for the languages we decide between
+    iso_codes = tuple(sorted({"en", target_lang, ignore_lang}))
+    detector = _get_detector(iso_codes)
 
-    # Split into sentences and clean
+    # Check entire doc first, unless the caller already filtered by language
+    if not assume_target:
+        detected_code = detect_language(document_text, detector)
+        if detected_code != target_lang:
+            return
+
+    # Split into sentences and stream out those not in the ignored language,
+    # detecting a batch at a time so lingua can still run it in parallel
     sentences = document_to_sentences(document_text)
-    sentences = [
-        sent for sent in sentences if detect_language(sent, detector) != ignore_lang
-    ]
-    sentences = [sent.strip() for sent in sentences]
-    return sentences
+    for start in range(0, len(sentences), DETECT_BATCH_SIZE):
+        batch = [
+            sent
+            for sent in sentences[start : start + DETECT_BATCH_SIZE]
+            if not _is_noise(sent)
+        ]
+        detected = _detect_sentences(
+            [sent for sent in batch if _worth_detecting(sent)], iso_codes
+        )
+        yield from (sent for sent in batch if detected.get(sent) != ignore_lang)
+
+
+def _is_noise(sentence: str) -> bool:
+    # URLs, DOIs, numeric tables and extraction debris are mostly non-letters
+    letters = len(_LETTER_RE.findall(sentence))
+    return letters < MIN_ALPHA_RATIO * len(sentence)
+
+
+def _worth_detecting(sentence: str) -> bool:
+    # Lingua is unreliable on fragments like citation numbers and single-word
+    # lines, so those are kept without paying for detection
+    if len(sentence) < MIN_DETECT_CHARS:
+        return False
+    return len(_WORD_RE.findall(sentence)) >= MIN_DETECT_WORDS
+
+
+def _detect_sentences(
+    sentences: List[str], iso_codes: Tuple[str, ...]
+) -> Dict[str, Optional[str]]:
+    """Language code of each distinct sentence, reusing earlier detections."""
+    detected = {}
+    misses = {}
+    for sent in sentences:
+        if sent in detected or sent in misses:
+            continue
+        # Headers, footers and captions repeat with varying whitespace
+        key = (iso_codes, " ".join(sent.split()))
+        if key in _DETECT_CACHE:
+            _DETECT_CACHE.move_to_end(key)
+            detected[sent] = _DETECT_CACHE[key]
+        else:
+            misses[sent] = key
+
+    # Lingua spreads the uncached sentences over its own threads
+    results = _get_detector(iso_codes).detect_languages_in_parallel_of(list(misses))
+    for (sent, key), result in zip(misses.items(), results):
+        code = result.iso_code_639_1.name.lower() if result else None
+        detected[sent] = _DETECT_CACHE[key] = code
+
+    while len(_DETECT_CACHE) > DETECT_CACHE_SIZE:
+        _DETECT_CACHE.popitem(last=False)
+    return detected
 
 
 def document_to_sentences(document: str) -> List[str]: